@@ -0,0 +1,152 @@
+import os
+import sqlite3
+import tempfile
+
+class RedisGraphStore:
+    """Concept graph kept in Redis, shared by every serverless invocation"""
+
+    LABELS_KEY = "graph:label_to_id"
+    EDGES_KEY = "graph:edges"
+    NEXT_ID_KEY = "graph:next_id"
+    LENGTHS_KEY = "graph:label_lengths"
+    LENGTH_KEY_PREFIX = "graph:labels:"
+
+    # Label, id and length bucket are written in one server-side step, so
+    # no reader or reset ever sees a label without its bucket
+    ADD_NODE_SCRIPT = """
+    local existing = redis.call('HGET', KEYS[1], ARGV[1])
+    if existing then
+        return {tonumber(existing), 0}
+    end
+    local node_id = redis.call('INCR', KEYS[2]) - 1
+    redis.call('HSET', KEYS[1], ARGV[1], node_id)
+    redis.call('HSET', KEYS[3], node_id, ARGV[1])
+    redis.call('SADD', KEYS[4], ARGV[2])
+    return {node_id, 1}
+    """
+
+    RESET_SCRIPT = """
+    local keys = KEYS
+    for _, length in ipairs(redis.call('SMEMBERS', KEYS[4])) do
+        table.insert(keys, ARGV[1] .. length)
+    end
+    return redis.call('DEL', unpack(keys))
+    """
+
+    def __init__(self, url):
+        import redis
+        self.redis = redis.Redis.from_url(url, decode_responses=True)
+        self.add_node_script = self.redis.register_script(self.ADD_NODE_SCRIPT)
+        self.reset_script = self.redis.register_script(self.RESET_SCRIPT)
+
+    def length_key(self, length):
+        """Hash of node id -> label for labels of the given length"""
+        return f"{self.LENGTH_KEY_PREFIX}{length}"
+
+    def get_id(self, label):
+        node_id = self.redis.hget(self.LABELS_KEY, label)
+        return int(node_id) if node_id is not None else None
+
+    def add_node(self, label):
+        """Return (node_id, created), creating the node if the label is new"""
+        node_id, created = self.add_node_script(
+            keys=[self.LABELS_KEY, self.NEXT_ID_KEY, self.length_key(len(label)), self.LENGTHS_KEY],
+            args=[label, len(label)]
+        )
+        return node_id, bool(created)
+
+    def labels_with_length(self, lengths):
+        """Return {node_id: label} for labels whose length is in lengths"""
+        pipe = self.redis.pipeline()
+        for length in lengths:
+            pipe.hgetall(self.length_key(length))
+        return {
+            int(node_id): label
+            for bucket in pipe.execute()
+            for node_id, label in bucket.items()
+        }
+
+    def has_edge(self, source, target):
+        return bool(self.redis.sismember(self.EDGES_KEY, f"{source}:{target}"))
+
+    def add_edge(self, source, target):
+        """Add a directed edge, returning False if it already existed"""
+        return self.redis.sadd(self.EDGES_KEY, f"{source}:{target}") == 1
+
+    def reset(self):
+        self.reset_script(
+            keys=[self.LABELS_KEY, self.EDGES_KEY, self.NEXT_ID_KEY, self.LENGTHS_KEY],
+            args=[self.LENGTH_KEY_PREFIX]
+        )
+
+
+class SQLiteGraphStore:
+    """Concept graph kept in a local SQLite file, for development"""
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS nodes ("
+                "id INTEGER PRIMARY KEY, label TEXT NOT NULL UNIQUE)"
+            )
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS edges ("
+                "source INTEGER NOT NULL, target INTEGER NOT NULL, "
+                "PRIMARY KEY (source, target))"
+            )
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS nodes_label_length ON nodes (length(label))"
+            )
+
+    def get_id(self, label):
+        row = self.conn.execute("SELECT id FROM nodes WHERE label = ?", (label,)).fetchone()
+        return row[0] if row else None
+
+    def add_node(self, label):
+        """Return (node_id, created), creating the node if the label is new"""
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT OR IGNORE INTO nodes (id, label) "
+                "SELECT COALESCE(MAX(id) + 1, 0), ? FROM nodes",
+                (label,)
+            )
+        if cursor.rowcount == 1:
+            return cursor.lastrowid, True
+        return self.get_id(label), False
+
+    def labels_with_length(self, lengths):
+        """Return {node_id: label} for labels whose length is in lengths"""
+        return dict(self.conn.execute(
+            "SELECT id, label FROM nodes WHERE length(label) BETWEEN ? AND ?",
+            (lengths[0], lengths[-1])
+        ))
+
+    def has_edge(self, source, target):
+        row = self.conn.execute(
+            "SELECT 1 FROM edges WHERE source = ? AND target = ?", (source, target)
+        ).fetchone()
+        return row is not None
+
+    def add_edge(self, source, target):
+        """Add a directed edge, returning False if it already existed"""
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT OR IGNORE INTO edges (source, target) VALUES (?, ?)", (source, target)
+            )
+        return cursor.rowcount == 1
+
+    def reset(self):
+        with self.conn:
+            self.conn.execute("DELETE FROM nodes")
+            self.conn.execute("DELETE FROM edges")
+
+
+def create_graph_store():
+    """Use Redis when configured, otherwise fall back to a local SQLite file"""
+    redis_url = os.getenv("REDIS_URL") or os.getenv("KV_URL")
+    if redis_url:
+        return RedisGraphStore(redis_url)
+
+    db_path = os.getenv("GRAPH_DB_PATH") or os.path.join(tempfile.gettempdir(), "concept_graph.db")
+    return SQLiteGraphStore(db_path)
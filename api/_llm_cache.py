@@ -0,0 +1,65 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+import orjson
+
+# Seconds a cached LLM answer stays valid in Redis
+LLM_CACHE_TTL = 3600
+
+def llm_cache_key(api_data):
+    """Cache key for an OpenRouter request, insensitive to case and spacing of the prompts"""
+    normalized = dict(api_data)
+    normalized["messages"] = [
+        {"role": message["role"], "content": " ".join(message["content"].lower().split())}
+        for message in api_data["messages"]
+    ]
+    # Model, temperature and max_tokens are part of the payload, hence of the key
+    digest = hashlib.sha256(orjson.dumps(normalized, option=orjson.OPT_SORT_KEYS)).hexdigest()
+    return f"llm:{digest}"
+
+
+class RedisLLMCache:
+    """LLM answers shared by every serverless invocation, expiring after LLM_CACHE_TTL"""
+
+    def __init__(self, url):
+        import redis
+        self.redis = redis.Redis.from_url(url, decode_responses=True)
+
+    def get(self, key):
+        return self.redis.get(key)
+
+    def set(self, key, content):
+        self.redis.setex(key, LLM_CACHE_TTL, content)
+
+
+class MemoryLLMCache:
+    """LLM answers kept for the lifetime of the process, least recently used evicted first"""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        # Endpoints may call in from FastAPI's threadpool
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            content = self.entries.get(key)
+            if content is not None:
+                self.entries.move_to_end(key)
+            return content
+
+    def set(self, key, content):
+        with self.lock:
+            self.entries[key] = content
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+
+def create_llm_cache():
+    """Use Redis when configured, otherwise an in-process LRU"""
+    redis_url = os.getenv("REDIS_URL") or os.getenv("KV_URL")
+    if redis_url:
+        return RedisLLMCache(redis_url)
+    return MemoryLLMCache()
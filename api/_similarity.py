@@ -0,0 +1,110 @@
+import array
+import importlib.util
+import os
+import tempfile
+try:
+    from rapidfuzz import process
+    from rapidfuzz.distance import Levenshtein
+except ImportError:
+    # Fall back to calculate_similarity, compiled with Numba when available
+    process = None
+
+# Minimum Levenshtein similarity (0-1) to link two concepts
+SIMILARITY_THRESHOLD = 0.6
+
+# Numba only pays off as a fallback for RapidFuzz, and importing it is slow
+njit = None
+if process is None and importlib.util.find_spec("numba") is not None:
+    # Serverless bundles are read-only, so keep compiled code in the temp dir
+    os.environ.setdefault("NUMBA_CACHE_DIR", os.path.join(tempfile.gettempdir(), "numba_cache"))
+    import numpy as np
+    from numba import njit
+
+if njit is not None:
+    @njit(cache=True)
+    def _levenshtein_distance(codes1, codes2):
+        """Two-row Levenshtein distance between two arrays of code points"""
+        prev = np.arange(len(codes2) + 1).astype(np.int32)
+        curr = np.zeros(len(codes2) + 1, dtype=np.int32)
+        for i in range(1, len(codes1) + 1):
+            curr[0] = i
+            for j in range(1, len(codes2) + 1):
+                if codes1[i - 1] == codes2[j - 1]:
+                    curr[j] = prev[j - 1]
+                else:
+                    curr[j] = 1 + min(prev[j - 1], prev[j], curr[j - 1])
+            prev, curr = curr, prev
+        return prev[len(codes2)]
+    
+    def _code_points(text):
+        return np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32)
+
+def candidate_lengths(length):
+    """Label lengths that can still reach SIMILARITY_THRESHOLD against a label of this length"""
+    # The distance is at least the length difference, so a label of length m
+    # only qualifies when min(m, length) / max(m, length) > SIMILARITY_THRESHOLD
+    return range(int(length * SIMILARITY_THRESHOLD), int(length / SIMILARITY_THRESHOLD) + 1)
+
+def calculate_similarity(str1, str2):
+    """Calculate string similarity using Levenshtein distance"""
+    # Keep the DP rows as short as the shorter string
+    if len(str1) < len(str2):
+        str1, str2 = str2, str1
+    max_len = len(str1)
+    if max_len == 0:
+        return 1.0
+    
+    if njit is not None:
+        return 1 - (_levenshtein_distance(_code_points(str1), _code_points(str2)) / max_len)
+    
+    # Two packed rows of the Wagner-Fischer matrix instead of the full table
+    prev = array.array('i', range(len(str2) + 1))
+    curr = array.array('i', [0] * (len(str2) + 1))
+    for i, c1 in enumerate(str1, 1):
+        curr[0] = i
+        for j, c2 in enumerate(str2, 1):
+            if c1 == c2:
+                curr[j] = prev[j - 1]
+            else:
+                curr[j] = 1 + min(prev[j - 1], prev[j], curr[j - 1])
+        prev, curr = curr, prev
+    
+    return 1 - (prev[len(str2)] / max_len)
+
+if njit is not None:
+    # Compile on import so the first request does not pay for it
+    calculate_similarity("warm", "up")
+
+def find_similar_ids(new_lower, labels):
+    """Ids in labels ({node id: lowercased label}) similar enough to new_lower to link"""
+    if process is None:
+        return [
+            node_id for node_id, label in labels.items()
+            if calculate_similarity(new_lower, label) > SIMILARITY_THRESHOLD
+        ]
+    
+    # Score all labels in a single call; pairs below the
+    # cutoff are rejected on length difference or abandoned mid-DP
+    matches = process.extract(
+        new_lower,
+        labels,
+        scorer=Levenshtein.normalized_similarity,
+        score_cutoff=SIMILARITY_THRESHOLD,
+        limit=None
+    )
+    return [node_id for _, score, node_id in matches if score > SIMILARITY_THRESHOLD]
+
+def find_existing_concepts(new_concept, length_index):
+    """Find ids of existing concepts, indexed by label length, that could be connected to the new one"""
+    new_lower = new_concept.lower()
+    
+    # Score each compatible length bucket in place instead of copying
+    # them into a per-request candidate dict
+    similar_ids = []
+    for length in candidate_lengths(len(new_lower)):
+        bucket = length_index.get(length)
+        if bucket:
+            similar_ids.extend(find_similar_ids(new_lower, bucket))
+    
+    # Keep graph insertion order for the resulting edges
+    return sorted(similar_ids)
@@ -0,0 +1,77 @@
+import re
+from functools import lru_cache
+import orjson
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Patterns used by clean_concept, compiled once per process
+_RE_LEAD = re.compile(r'^[\d\-\*\•\.\)]+\s*')
+_RE_WS = re.compile(r'\s+')
+_RE_BAD = re.compile(r'[^\w\sáéíóúüñ]')
+
+@lru_cache(maxsize=4096)
+def clean_concept(concept):
+    """Clean and normalize concept text"""
+    if not concept:
+        return ""
+    
+    # Remove numbers, bullets, and special characters at start
+    concept = _RE_LEAD.sub('', concept)
+    
+    # Remove extra whitespace
+    concept = _RE_WS.sub(' ', concept).strip()
+    
+    # Capitalize first letter
+    concept = concept.capitalize()
+    
+    # Remove unwanted characters
+    concept = _RE_BAD.sub('', concept)
+    
+    return concept.strip()
+
+
+def create_session(headers):
+    """Create a keep-alive HTTP session with the given static headers"""
+    session = requests.Session()
+    session.headers.update(headers)
+    
+    # Pool connections so TCP/TLS handshakes are reused between calls
+    adapter = HTTPAdapter(
+        pool_connections=10,
+        pool_maxsize=10,
+        max_retries=Retry(total=2, backoff_factor=0.1)
+    )
+    session.mount("https://", adapter)
+    return session
+
+
+def read_json_body(handler, max_size, string_fields=()):
+    """Parse the request body as a JSON object, or answer 400/413 and return None"""
+    try:
+        content_length = int(handler.headers.get('Content-Length', '0'))
+    except ValueError:
+        content_length = 0
+    
+    # Reject oversize payloads before reading them
+    if content_length > max_size:
+        handler.send_error(413, "Request body too large")
+        return None
+    if content_length <= 0:
+        handler.send_error(400, "Request body required")
+        return None
+    
+    try:
+        data = orjson.loads(handler.rfile.read(content_length))
+    except orjson.JSONDecodeError:
+        data = None
+    if not isinstance(data, dict):
+        handler.send_error(400, "Request body must be a JSON object")
+        return None
+    
+    # Handlers call str methods on these fields, so reject other types here
+    for field in string_fields:
+        if not isinstance(data.get(field, ''), str):
+            handler.send_error(400, f"'{field}' must be a string")
+            return None
+    return data
@@ -1,11 +1,26 @@
 from http.server import BaseHTTPRequestHandler
-import json
-import requests
+import orjson
 import os
-import re
+from api._utils import clean_concept, create_session, read_json_body
+from api._llm_cache import create_llm_cache, llm_cache_key
+
+# OpenRouter session reused across warm invocations
+session = create_session({
+    "Content-Type": "application/json",
+    "HTTP-Referer": "https://www.becreativia.com",
+    "X-Title": "Concept Graph Visualizer"
+})
+
+# Answers for inputs already seen skip the OpenRouter round trip
+llm_cache = create_llm_cache()
+
+# Largest request body accepted, in bytes
+_MAX_BODY = 64 * 1024
 
 class handler(BaseHTTPRequestHandler):
     def do_POST(self):
+        # Read by the error fallback, even if the body never parsed
+        data = {}
         try:
             # Get API key
             OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
@@ -16,19 +31,16 @@ class handler(BaseHTTPRequestHandler):
             # Clean API key (remove any whitespace/newlines)
             OPENROUTER_API_KEY = OPENROUTER_API_KEY.strip()
 
-            # Read request body
-            content_length = int(self.headers['Content-Length'])
-            post_data = self.rfile.read(content_length)
-            data = json.loads(post_data.decode('utf-8'))
+            # Read request body, rejecting oversize or malformed payloads
+            data = read_json_body(self, _MAX_BODY, string_fields=('text',))
+            if data is None:
+                return
             
             text = data.get('text', '')
             
             # Call OpenRouter API
             headers = {
-                "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-                "Content-Type": "application/json",
-                "HTTP-Referer": "https://www.becreativia.com",
-                "X-Title": "Concept Graph Visualizer"
+                "Authorization": f"Bearer {OPENROUTER_API_KEY}"
             }
             
             messages = [
@@ -62,21 +74,29 @@ EJEMPLOS:
                 "temperature": 0.3
             }
             
-            response = requests.post("https://openrouter.ai/api/v1/chat/completions", 
-                                   headers=headers, json=api_data)
-            response.raise_for_status()
-            
-            content = response.json()["choices"][0]["message"]["content"].strip()
+            cache_key = llm_cache_key(api_data)
+            content = llm_cache.get(cache_key)
+            fetched = content is None
+            if fetched:
+                response = session.post("https://openrouter.ai/api/v1/chat/completions", 
+                                        headers=headers, data=orjson.dumps(api_data))
+                response.raise_for_status()
+                content = orjson.loads(response.content)["choices"][0]["message"]["content"]
+            content = content.strip()
             
             # Parse response
-            parts = content.split("|")
+            parts = content.split("|", 2)
             if len(parts) >= 3:
                 concept_type = parts[0].strip()
                 extracted = parts[1].strip()
                 explanation = parts[2].strip()
                 
                 is_concept = concept_type == "CONCEPTO"
-                cleaned_concept = self.clean_concept(extracted)
+                cleaned_concept = clean_concept(extracted)
+                
+                # Only well-formed answers are cached, so a malformed one is asked again
+                if fetched:
+                    llm_cache.set(cache_key, content)
                 
                 result = {
                     "is_concept": is_concept,
@@ -85,7 +105,7 @@ EJEMPLOS:
                 }
             else:
                 # Fallback
-                cleaned = self.clean_concept(text.split()[0]) if text.split() else "Concepto"
+                cleaned = clean_concept(text.split()[0]) if text.split() else "Concepto"
                 result = {
                     "is_concept": True,
                     "extracted_concept": cleaned,
@@ -97,11 +117,11 @@ EJEMPLOS:
             self.send_header('Content-type', 'application/json')
             self.send_header('Access-Control-Allow-Origin', '*')
             self.end_headers()
-            self.wfile.write(json.dumps(result).encode())
+            self.wfile.write(orjson.dumps(result))
             
         except Exception as e:
             # Fallback on error
-            cleaned = self.clean_concept(data.get('text', '').split()[0]) if data.get('text', '').split() else "Concepto"
+            cleaned = clean_concept(data.get('text', '').split()[0]) if data.get('text', '').split() else "Concepto"
             result = {
                 "is_concept": True,
                 "extracted_concept": cleaned,
@@ -112,26 +132,7 @@ EJEMPLOS:
             self.send_header('Content-type', 'application/json')
             self.send_header('Access-Control-Allow-Origin', '*')
             self.end_headers()
-            self.wfile.write(json.dumps(result).encode())
-    
-    def clean_concept(self, concept):
-        """Clean and normalize concept text"""
-        if not concept:
-            return ""
-        
-        # Remove numbers, bullets, and special characters at start
-        concept = re.sub(r'^[\d\-\*\•\.\)]+\s*', '', concept)
-        
-        # Remove extra whitespace
-        concept = re.sub(r'\s+', ' ', concept).strip()
-        
-        # Capitalize first letter
-        concept = concept.capitalize()
-        
-        # Remove unwanted characters
-        concept = re.sub(r'[^\w\sáéíóúüñ]', '', concept)
-        
-        return concept.strip()
+            self.wfile.write(orjson.dumps(result))
     
     def do_OPTIONS(self):
         self.send_response(200)
@@ -1,8 +1,21 @@
 from http.server import BaseHTTPRequestHandler
-import json
-import requests
+import orjson
 import os
-import re
+from api._utils import clean_concept, create_session, read_json_body
+from api._llm_cache import create_llm_cache, llm_cache_key
+
+# OpenRouter session reused across warm invocations
+session = create_session({
+    "Content-Type": "application/json",
+    "HTTP-Referer": "https://www.becreativia.com",
+    "X-Title": "Concept Graph Visualizer"
+})
+
+# Answers for inputs already seen skip the OpenRouter round trip
+llm_cache = create_llm_cache()
+
+# Largest request body accepted, in bytes
+_MAX_BODY = 64 * 1024
 
 class handler(BaseHTTPRequestHandler):
     def do_POST(self):
@@ -16,20 +29,17 @@ class handler(BaseHTTPRequestHandler):
             # Clean API key (remove any whitespace/newlines)
             OPENROUTER_API_KEY = OPENROUTER_API_KEY.strip()
 
-            # Read request body
-            content_length = int(self.headers['Content-Length'])
-            post_data = self.rfile.read(content_length)
-            data = json.loads(post_data.decode('utf-8'))
+            # Read request body, rejecting oversize or malformed payloads
+            data = read_json_body(self, _MAX_BODY, string_fields=('concept',))
+            if data is None:
+                return
             
             concept = data.get('concept', '')
             cycles = data.get('cycles', 3)
             
             # Call OpenRouter API
             headers = {
-                "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-                "Content-Type": "application/json",
-                "HTTP-Referer": "https://www.becreativia.com",
-                "X-Title": "Concept Graph Visualizer"
+                "Authorization": f"Bearer {OPENROUTER_API_KEY}"
             }
             
             messages = [
@@ -63,20 +73,29 @@ Concepto3"""
                 "temperature": 0.5
             }
             
-            response = requests.post("https://openrouter.ai/api/v1/chat/completions", 
-                                   headers=headers, json=api_data)
-            response.raise_for_status()
-            
-            concepts_text = response.json()["choices"][0]["message"]["content"].strip()
+            cache_key = llm_cache_key(api_data)
+            concepts_text = llm_cache.get(cache_key)
+            fetched = concepts_text is None
+            if fetched:
+                response = session.post("https://openrouter.ai/api/v1/chat/completions", 
+                                        headers=headers, data=orjson.dumps(api_data))
+                response.raise_for_status()
+                concepts_text = orjson.loads(response.content)["choices"][0]["message"]["content"]
+            concepts_text = concepts_text.strip()
             raw_concepts = [concept.strip() for concept in concepts_text.split('\n') if concept.strip()]
             
             # Clean and normalize concepts
             related_concepts = []
             for concept in raw_concepts[:3]:  # Take only first 3
-                cleaned = self.clean_concept(concept)
+                cleaned = clean_concept(concept)
                 if cleaned and len(cleaned) > 1:  # Valid concept
                     related_concepts.append(cleaned)
             
+            # Only answers that yield 3 concepts on their own are cached, so
+            # one that needs placeholders is asked again
+            if fetched and len(related_concepts) == 3:
+                llm_cache.set(cache_key, concepts_text)
+            
             # Ensure we have exactly 3 concepts
             while len(related_concepts) < 3:
                 fallback = f"Relacionado{len(related_concepts) + 1}"
@@ -89,30 +108,11 @@ Concepto3"""
             self.send_header('Content-type', 'application/json')
             self.send_header('Access-Control-Allow-Origin', '*')
             self.end_headers()
-            self.wfile.write(json.dumps(result).encode())
+            self.wfile.write(orjson.dumps(result))
             
         except Exception as e:
             self.send_error(500, f"Error generating concepts: {str(e)}")
     
-    def clean_concept(self, concept):
-        """Clean and normalize concept text"""
-        if not concept:
-            return ""
-        
-        # Remove numbers, bullets, and special characters at start
-        concept = re.sub(r'^[\d\-\*\•\.\)]+\s*', '', concept)
-        
-        # Remove extra whitespace
-        concept = re.sub(r'\s+', ' ', concept).strip()
-        
-        # Capitalize first letter
-        concept = concept.capitalize()
-        
-        # Remove unwanted characters
-        concept = re.sub(r'[^\w\sáéíóúüñ]', '', concept)
-        
-        return concept.strip()
-    
     def do_OPTIONS(self):
         self.send_response(200)
         self.send_header('Access-Control-Allow-Origin', '*')
@@ -1,5 +1,5 @@
 from http.server import BaseHTTPRequestHandler
-import json
+import orjson
 import os
 
 class handler(BaseHTTPRequestHandler):
@@ -15,7 +15,7 @@ class handler(BaseHTTPRequestHandler):
             "api_key_configured": bool(os.getenv("OPENROUTER_API_KEY"))
         }
         
-        self.wfile.write(json.dumps(response).encode())
+        self.wfile.write(orjson.dumps(response))
         return
     
     def do_OPTIONS(self):
@@ -1,18 +1,15 @@
 from http.server import BaseHTTPRequestHandler
-import json
+import orjson
+from api._graph_store import create_graph_store
 
-# In-memory storage for the concept graph
-concept_graph = {
-    "nodes": {},
-    "edges": []
-}
+# Concept graph shared across invocations (Redis, or SQLite locally)
+graph_store = create_graph_store()
 
 class handler(BaseHTTPRequestHandler):
     def do_DELETE(self):
         try:
             # Reset the graph
-            concept_graph["nodes"] = {}
-            concept_graph["edges"] = []
+            graph_store.reset()
             
             result = {"status": "Graph reset successfully"}
             
@@ -21,7 +18,7 @@ class handler(BaseHTTPRequestHandler):
             self.send_header('Content-type', 'application/json')
             self.send_header('Access-Control-Allow-Origin', '*')
             self.end_headers()
-            self.wfile.write(json.dumps(result).encode())
+            self.wfile.write(orjson.dumps(result))
             
         except Exception as e:
             self.send_error(500, f"Error resetting graph: {str(e)}")
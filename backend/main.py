@@ -1,17 +1,27 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 from typing import List, Dict, Optional
-import requests
+import httpx
 import os
+import sys
 from dotenv import load_dotenv
-import json
+import orjson
 from datetime import datetime
+import itertools
+import threading
 import re
+from functools import lru_cache
+from collections import OrderedDict
+
+# Similarity scoring is shared with the serverless functions in api/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api._similarity import find_existing_concepts
 
 load_dotenv()
 
-app = FastAPI(title="Concept Graph API")
+app = FastAPI(title="Concept Graph API", default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -22,7 +32,33 @@ app.add_middleware(
 )
 
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
-OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1/chat/completions"
+OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+
+# Async OpenRouter client shared by every call, opened on startup
+openrouter_client = None
+
+@app.on_event("startup")
+async def open_openrouter_client():
+    global openrouter_client
+    openrouter_client = httpx.AsyncClient(
+        base_url=OPENROUTER_BASE_URL,
+        headers={
+            "Authorization": f"Bearer {OPENROUTER_API_KEY}",
+            "Content-Type": "application/json",
+            "HTTP-Referer": "http://localhost:3000",
+            "X-Title": "Concept Graph Visualizer"
+        },
+        timeout=30,
+        transport=httpx.AsyncHTTPTransport(http2=True, retries=2)
+    )
+
+@app.on_event("shutdown")
+async def close_openrouter_client():
+    await openrouter_client.aclose()
+
+# OpenRouter answers for prompts already seen, least recently used evicted first
+LLM_CACHE_SIZE = 1024
+llm_cache = OrderedDict()
 
 class ConceptRequest(BaseModel):
     concept: str
@@ -50,82 +86,60 @@ concept_graph = {
     "edges": []
 }
 
+# Index of node label -> node id for constant-time lookups
+label_to_id = {}
+
+# (source, target) pairs of every edge for constant-time dedup
+edges_set = set()
+
+# Label length -> {node id: lowercased label}, so a similarity scan only
+# scores the lengths that can still reach the threshold
+length_index = {}
+
+# Ids for new nodes; the lock keeps the node, indexes and edges of one
+# insertion consistent when requests run concurrently
+concept_ids = itertools.count()
+graph_lock = threading.Lock()
+
 
 # Store all generated concepts for cross-referencing
 all_generated_concepts = set()
 
+# Patterns used by clean_concept, compiled once per process
+_RE_LEAD = re.compile(r'^[\d\-\*\•\.\)]+\s*')
+_RE_WS = re.compile(r'\s+')
+_RE_BAD = re.compile(r'[^\w\sáéíóúüñ]')
+
+@lru_cache(maxsize=4096)
 def clean_concept(concept):
     """Clean and normalize concept text"""
     if not concept:
         return ""
     
     # Remove numbers, bullets, and special characters at start
-    concept = re.sub(r'^[\d\-\*\•\.\)]+\s*', '', concept)
+    concept = _RE_LEAD.sub('', concept)
     
     # Remove extra whitespace
-    concept = re.sub(r'\s+', ' ', concept).strip()
+    concept = _RE_WS.sub(' ', concept).strip()
     
     # Capitalize first letter
     concept = concept.capitalize()
     
     # Remove unwanted characters
-    concept = re.sub(r'[^\w\sáéíóúüñ]', '', concept)
+    concept = _RE_BAD.sub('', concept)
     
     return concept.strip()
 
-def find_existing_concepts(new_concept, existing_concepts):
-    """Find existing concepts that could be connected to the new one"""
-    connections = []
-    new_lower = new_concept.lower()
-    
-    for existing in existing_concepts:
-        existing_lower = existing.lower()
-        
-        # Check for semantic relationships
-        if (new_lower in existing_lower or existing_lower in new_lower or
-            abs(len(new_lower) - len(existing_lower)) <= 2):
-            # Calculate similarity
-            similarity = calculate_similarity(new_lower, existing_lower)
-            if similarity > 0.6:  # 60% similarity threshold
-                connections.append(existing)
-    
-    return connections
+def llm_cache_key(data):
+    """Cache key for an OpenRouter request, insensitive to case and spacing of the prompts"""
+    messages = tuple(
+        (message["role"], " ".join(message["content"].lower().split()))
+        for message in data["messages"]
+    )
+    return (data["model"], data["temperature"], data["max_tokens"], messages)
 
-def calculate_similarity(str1, str2):
-    """Calculate string similarity using Levenshtein distance"""
-    if len(str1) == 0: return len(str2)
-    if len(str2) == 0: return len(str1)
-    
-    matrix = [[0] * (len(str2) + 1) for _ in range(len(str1) + 1)]
-    
-    for i in range(len(str1) + 1):
-        matrix[i][0] = i
-    for j in range(len(str2) + 1):
-        matrix[0][j] = j
-        
-    for i in range(1, len(str1) + 1):
-        for j in range(1, len(str2) + 1):
-            if str1[i-1] == str2[j-1]:
-                matrix[i][j] = matrix[i-1][j-1]
-            else:
-                matrix[i][j] = min(
-                    matrix[i-1][j] + 1,
-                    matrix[i][j-1] + 1,
-                    matrix[i-1][j-1] + 1
-                )
-    
-    max_len = max(len(str1), len(str2))
-    return 1 - (matrix[len(str1)][len(str2)] / max_len)
-
-def call_openrouter_api(messages, max_tokens=50, temperature=0.5):
-    """Helper function to call OpenRouter API"""
-    headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "Content-Type": "application/json",
-        "HTTP-Referer": "http://localhost:3000",
-        "X-Title": "Concept Graph Visualizer"
-    }
-    
+async def call_openrouter_api(messages, max_tokens=50, temperature=0.5, is_usable=None):
+    """Helper function to call OpenRouter API, returning the message content"""
     data = {
         "model": "openrouter/horizon-beta",
         "messages": messages,
@@ -133,9 +147,32 @@ def call_openrouter_api(messages, max_tokens=50, temperature=0.5):
         "temperature": temperature
     }
     
-    response = requests.post(OPENROUTER_BASE_URL, headers=headers, json=data)
+    cache_key = llm_cache_key(data)
+    if cache_key in llm_cache:
+        llm_cache.move_to_end(cache_key)
+        return llm_cache[cache_key]
+    
+    response = await openrouter_client.post("/chat/completions", content=orjson.dumps(data))
     response.raise_for_status()
-    return response.json()
+    content = orjson.loads(response.content)["choices"][0]["message"]["content"]
+    
+    # Malformed answers are not cached, so the next request asks again
+    if is_usable is None or is_usable(content):
+        llm_cache[cache_key] = content
+        if len(llm_cache) > LLM_CACHE_SIZE:
+            llm_cache.popitem(last=False)
+    return content
+
+def parse_related_concepts(concepts_text):
+    """Clean the model's one-per-line answer into at most 3 valid concepts"""
+    raw_concepts = [concept.strip() for concept in concepts_text.split('\n') if concept.strip()]
+    
+    related_concepts = []
+    for concept in raw_concepts[:3]:  # Take only first 3
+        cleaned = clean_concept(concept)
+        if cleaned and len(cleaned) > 1:  # Valid concept
+            related_concepts.append(cleaned)
+    return related_concepts
 
 @app.post("/analyze-concept", response_model=ConceptAnalysisResponse)
 async def analyze_concept(request: ConceptAnalysisRequest):
@@ -164,11 +201,13 @@ EJEMPLOS:
             }
         ]
         
-        response = call_openrouter_api(messages, max_tokens=100, temperature=0.3)
-        content = response["choices"][0]["message"]["content"].strip()
+        content = (await call_openrouter_api(
+            messages, max_tokens=100, temperature=0.3,
+            is_usable=lambda answer: len(answer.split("|", 2)) >= 3
+        )).strip()
         
         # Parse response
-        parts = content.split("|")
+        parts = content.split("|", 2)
         if len(parts) >= 3:
             concept_type = parts[0].strip()
             extracted = parts[1].strip()
@@ -227,18 +266,14 @@ Concepto3"""
             }
         ]
         
-        response = call_openrouter_api(messages, max_tokens=50, temperature=0.5)
-        concepts_text = response["choices"][0]["message"]["content"].strip()
-        raw_concepts = [concept.strip() for concept in concepts_text.split('\n') if concept.strip()]
+        concepts_text = (await call_openrouter_api(
+            messages, max_tokens=50, temperature=0.5,
+            is_usable=lambda answer: len(parse_related_concepts(answer)) == 3
+        )).strip()
         
-        # Clean and normalize concepts
-        related_concepts = []
-        for concept in raw_concepts[:3]:  # Take only first 3
-            cleaned = clean_concept(concept)
-            if cleaned and len(cleaned) > 1:  # Valid concept
-                # Add to global concept store
-                all_generated_concepts.add(cleaned)
-                related_concepts.append(cleaned)
+        # Clean and normalize concepts, adding them to the global concept store
+        related_concepts = parse_related_concepts(concepts_text)
+        all_generated_concepts.update(related_concepts)
         
         # Ensure we have exactly 3 concepts
         while len(related_concepts) < 3:
@@ -261,67 +296,53 @@ async def add_concept(concept: str, parent: Optional[str] = None):
     # Add to global concepts
     all_generated_concepts.add(concept)
     
-    concept_id = len(concept_graph["nodes"])
-    
-    # Check if concept already exists
-    existing_id = None
-    for node_id, node in concept_graph["nodes"].items():
-        if node["label"] == concept:
-            existing_id = node_id
-            break
-    
-    # Add node if it doesn't exist
-    if existing_id is None:
-        concept_graph["nodes"][concept_id] = {
-            "id": concept_id,
-            "label": concept,
-            "x": 0,
-            "y": 0,
-            "z": 0
-        }
-        node_id = concept_id
-    else:
-        node_id = existing_id
-    
-    # Add edge if parent is provided
-    if parent:
-        parent_id = None
-        for pid, node in concept_graph["nodes"].items():
-            if node["label"] == parent:
-                parent_id = pid
-                break
+    with graph_lock:
+        # Check if concept already exists
+        existing_id = label_to_id.get(concept)
         
-        if parent_id is not None:
-            # Check if edge already exists
-            edge_exists = any(
-                edge["source"] == parent_id and edge["target"] == node_id
-                for edge in concept_graph["edges"]
-            )
-            
-            if not edge_exists:
-                concept_graph["edges"].append({
-                    "source": parent_id,
-                    "target": node_id
-                })
-    
-    # Find and create connections to existing similar concepts
-    existing_concepts = [node["label"] for node in concept_graph["nodes"].values()]
-    similar_concepts = find_existing_concepts(concept, existing_concepts)
-    
-    for similar in similar_concepts:
-        if similar != concept and similar != parent:
-            similar_id = None
-            for sid, node in concept_graph["nodes"].items():
-                if node["label"] == similar:
-                    similar_id = sid
-                    break
+        # Add node if it doesn't exist
+        if existing_id is None:
+            concept_id = next(concept_ids)
+            concept_graph["nodes"][concept_id] = {
+                "id": concept_id,
+                "label": concept,
+                "x": 0,
+                "y": 0,
+                "z": 0
+            }
+            label_to_id[concept] = concept_id
+            label_lower = concept.lower()
+            length_index.setdefault(len(label_lower), {})[concept_id] = label_lower
+            node_id = concept_id
+        else:
+            node_id = existing_id
+        
+        # Add edge if parent is provided
+        parent_id = None
+        if parent:
+            parent_id = label_to_id.get(parent)
             
-            if similar_id is not None:
+            if parent_id is not None:
+                # Check if edge already exists
+                if (parent_id, node_id) not in edges_set:
+                    concept_graph["edges"].append({
+                        "source": parent_id,
+                        "target": node_id
+                    })
+                    edges_set.add((parent_id, node_id))
+        
+        # Find and create connections to existing similar concepts; a concept
+        # already in the graph got them when it was first added
+        similar_ids = []
+        if existing_id is None:
+            similar_ids = find_existing_concepts(concept, length_index)
+        
+        for similar_id in similar_ids:
+            if similar_id != node_id and similar_id != parent_id:
                 # Add bidirectional connection for similar concepts
-                edge_exists = any(
-                    (edge["source"] == node_id and edge["target"] == similar_id) or
-                    (edge["source"] == similar_id and edge["target"] == node_id)
-                    for edge in concept_graph["edges"]
+                edge_exists = (
+                    (node_id, similar_id) in edges_set or
+                    (similar_id, node_id) in edges_set
                 )
                 
                 if not edge_exists:
@@ -329,20 +350,28 @@ async def add_concept(concept: str, parent: Optional[str] = None):
                         "source": node_id,
                         "target": similar_id
                     })
+                    edges_set.add((node_id, similar_id))
     
-    return {"status": "success", "concept_id": node_id, "similar_connections": len(similar_concepts)}
+    return {"status": "success", "concept_id": node_id, "similar_connections": len(similar_ids)}
 
 @app.get("/graph", response_model=GraphData)
 async def get_graph():
-    return GraphData(
-        nodes=list(concept_graph["nodes"].values()),
-        edges=concept_graph["edges"]
-    )
+    with graph_lock:
+        return GraphData(
+            nodes=list(concept_graph["nodes"].values()),
+            edges=concept_graph["edges"]
+        )
 
 @app.delete("/reset-graph")
 async def reset_graph():
-    concept_graph["nodes"] = {}
-    concept_graph["edges"] = []
+    global concept_ids
+    with graph_lock:
+        concept_graph["nodes"] = {}
+        concept_graph["edges"] = []
+        label_to_id.clear()
+        edges_set.clear()
+        length_index.clear()
+        concept_ids = itertools.count()
     # Don't clear all_generated_concepts to maintain cross-session connections
     return {"status": "Graph reset successfully"}
 